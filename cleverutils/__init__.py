@@ -2,3 +2,7 @@ from .clevergui import *
 from .cleversession import *
 from .cleverutils import *
 from .cleverweb import *
+from .cleverbench import *
+from .cleverworkers import *
+from .cleverscale import *
+from .cleverprofiles import *
@@ -0,0 +1,253 @@
+"""
+A local stand-in for the websites supported by Login_to, plus a simple
+benchmark harness for measuring login and scraping throughput without
+hitting the real websites (which are slow, rate-limited, and not
+reproducible).
+"""
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions
+from .cleverweb import BasicSession, Login_to, disable_logging, get_page
+
+# Login forms with the same element IDs/names/XPaths that Login_to looks for:
+LOGIN_FORMS = {
+    "github": """
+<form action="/github/session" method="post">
+  <input type="text" id="login_field" name="login">
+  <input type="password" id="password" name="password">
+  <input type="submit" name="commit" value="Sign in">
+</form>""",
+    "twitter": """
+<form action="/twitter/session" method="post">
+  <input type="text" name="session[username_or_email]">
+  <input type="password" name="session[password]">
+  <div role="button" onclick="document.forms[0].submit()"><span>Log in</span></div>
+</form>""",
+    "hackerrank": """
+<div id="tab-1-content-1">
+  <div>
+    <form action="/hackerrank/session" method="post">
+      <div><input type="text" id="input-1" name="username"></div>
+      <div><input type="password" id="input-2" name="password"></div>
+      <div><label><input type="checkbox"> Remember me</label></div>
+      <div><button type="submit">Log In</button></div>
+    </form>
+  </div>
+</div>""",
+    "tplink": """
+<form action="/tplink/session" method="post">
+  <input type="password" id="password" name="password">
+  <button type="button" id="loginBtn" onclick="document.forms[0].submit()">Log In</button>
+</form>""",
+}
+
+LOGIN_PATHS = {"github": "/github/login",
+               "twitter": "/twitter/login",
+               "hackerrank": "/hackerrank/auth/login",
+               "tplink": "/tplink/login.html"}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves login pages, post-login dashboards, and numbered content pages
+    (/page/1, /page/2 ...) after waiting self.server.latency seconds.
+    Every page is padded to roughly self.server.page_weight bytes and has an
+    ETag, so conditional requests get 304 Not Modified.
+    """
+
+    def do_GET(self):
+        for site, path in LOGIN_PATHS.items():
+            if self.path.startswith(path):
+                return self.respond(f"{site} login", LOGIN_FORMS[site])
+        if self.path.startswith("/page/"):
+            number = self.path.split("/")[2] or "0"
+            links = "".join(f'<li><a href="/page/{number}{x}">Link {x}</a></li>' for x in range(10))
+            return self.respond(f"Page {number}", f'<h1 id="title">Page {number}</h1><ul>{links}</ul>')
+        self.respond("Not found", "", status=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        site = self.path.strip("/").split("/")[0]
+        self.respond(f"{site} dashboard", '<div id="dashboard">OK we\'re in!</div>')
+
+    def respond(self, title, body, status=200):
+        time.sleep(self.server.latency)
+        padding = "x" * max(self.server.page_weight - len(body), 0)
+        html = (f"<!DOCTYPE html><html><head><title>{title}</title></head><body>{body}"
+                f'<div style="display:none">{padding}</div></body></html>').encode()
+        etag = f'"{hashlib.md5(html).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(html)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(html)
+
+    def log_message(self, format, *args):
+        """ Silence default logging to stderr """
+        pass
+
+class StandInSite:
+    """
+    A local HTTP server standing in for Github, Twitter, HackerRank and TP-Link
+    login pages, with configurable server latency (seconds) and page weight
+    (bytes).  Use as a context manager:
+
+    with StandInSite(latency=0.1, page_weight=100_000) as site:
+        print(site.login_url("github"))
+    """
+
+    def __init__(self, latency=0.0, page_weight=0, port=0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+        self.server.latency = latency
+        self.server.page_weight = page_weight
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def login_url(self, site):
+        """ Returns the local URL standing in for Login_to.<site> """
+        return self.url + LOGIN_PATHS[site]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+def start_browsers(count, headless=True, wait="implicit"):
+    """
+    Starts count Chrome browsers in parallel.  wait="implicit" sets a 3 second
+    implicitly_wait; wait="explicit" relies on WebDriverWait instead.
+    """
+    browsers = [None] * count
+    def launch(index):
+        browsers[index] = webdriver.Chrome(options=disable_logging(headless=headless))
+        browsers[index].implicitly_wait(3 if wait == "implicit" else 0)
+    threads = [threading.Thread(target=launch, args=[n]) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return browsers
+
+def run_in_browsers(browsers, jobs, func):
+    """
+    Shares jobs (a list) between browsers, one thread per browser, calling
+    func(browser, job) for each.  A job which raises an exception is recorded
+    as an error and the browser carries on with its remaining jobs.
+
+    Returns
+    -------
+    tuple:
+        (elapsed seconds, number of jobs completed, list of error reprs)
+    """
+    completed, errors = [], []
+    def worker(browser, batch):
+        for job in batch:
+            try:
+                func(browser, job)
+                completed.append(job)
+            except Exception as error:
+                errors.append(repr(error))
+    threads = [threading.Thread(target=worker, args=[browser, jobs[n::len(browsers)]])
+               for n, browser in enumerate(browsers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(completed), errors
+
+def benchmark_logins(site="github", browsers=(1, 2, 4), headless=(True,), waits=("implicit", "explicit"), logins=20, latency=0.05, page_weight=50_000):
+    """
+    Measures logins per minute for Login_to.<site> against a local StandInSite
+    for every combination of browser count, headless mode, and wait strategy.
+    Browser start-up time is excluded.
+
+    Returns
+    -------
+    list:
+        One dict per combination, including "logins_per_minute" (based
+        on successful logins only) and "errors"
+    """
+    results = []
+    with StandInSite(latency=latency, page_weight=page_weight) as stand_in:
+        for count in browsers:
+            for mode in headless:
+                for wait in waits:
+                    drivers = start_browsers(count, headless=mode, wait=wait)
+                    def login(browser, job):
+                        session = BasicSession(browser=browser, username="benchmark",
+                                                 password="benchmark", account=site,
+                                                 login_url=stand_in.login_url(site))
+                        getattr(Login_to, site)(session)
+                        if wait == "explicit":
+                            WebDriverWait(browser, 10).until(expected_conditions.presence_of_element_located((By.ID, "dashboard")))
+                        else:
+                            browser.find_element(By.ID, "dashboard")
+                    try:
+                        seconds, completed, errors = run_in_browsers(drivers, list(range(logins)), login)
+                    finally:
+                        for driver in drivers:
+                            driver.quit()
+                    results.append({"site": site, "browsers": count, "headless": mode,
+                                    "wait": wait, "logins": completed, "errors": errors,
+                                    "seconds": seconds,
+                                    "logins_per_minute": completed * 60 / seconds})
+    return results
+
+def benchmark_pages(browsers=(1, 2, 4), headless=(True,), waits=("implicit", "explicit"), pages=50, latency=0.05, page_weight=50_000):
+    """
+    Measures pages per second loaded (and title element found) from a local
+    StandInSite for every combination of browser count, headless mode, and
+    wait strategy.  Browser start-up time is excluded.
+
+    Returns
+    -------
+    list:
+        One dict per combination, including "pages_per_second" (based on
+        successful page loads only) and "errors"
+    """
+    results = []
+    with StandInSite(latency=latency, page_weight=page_weight) as stand_in:
+        for count in browsers:
+            for mode in headless:
+                for wait in waits:
+                    drivers = start_browsers(count, headless=mode, wait=wait)
+                    def scrape(browser, job):
+                        session = BasicSession(browser=browser)
+                        get_page(session, f"{stand_in.url}/page/{job}", "page")
+                        if wait == "explicit":
+                            WebDriverWait(browser, 10).until(expected_conditions.presence_of_element_located((By.ID, "title")))
+                        else:
+                            browser.find_element(By.ID, "title")
+                    try:
+                        seconds, completed, errors = run_in_browsers(drivers, list(range(pages)), scrape)
+                    finally:
+                        for driver in drivers:
+                            driver.quit()
+                    results.append({"browsers": count, "headless": mode, "wait": wait,
+                                    "pages": completed, "errors": errors,
+                                    "seconds": seconds,
+                                    "pages_per_second": completed / seconds})
+    return results
@@ -0,0 +1,189 @@
+"""
+Warm Chrome profile templates, so new browsers start with a populated HTTP
+cache, service workers, and logged-in state instead of an empty profile.
+
+A profile directory is captured once as a named template, and each new
+browser gets a cheap copy: reflinks (true copy-on-write) where the
+filesystem supports them, hardlinks for cache entries, and ordinary copies
+for everything else.  Stale templates and copies are cleaned up
+automatically.
+
+user_data_dir = clone_profile("github")
+browser = webdriver.Chrome(options=disable_logging(user_data_dir=user_data_dir))
+"""
+import atexit
+import os
+import re
+import shutil
+import stat
+import time
+import uuid
+from pathlib import Path
+from cleverdict.cleverdict import get_app_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PROFILES_PATH = Path(get_app_dir("cleverutils")) / "profiles"
+FICLONE = 0x40049409  # Linux ioctl for reflink copies (Btrfs, XFS etc.)
+# Chrome's per-process lock files mustn't be copied:
+SKIP = re.compile(r"^Singleton(Lock|Socket|Cookie)$")
+# Cache entries are replaced rather than modified, so are safe to hardlink
+# from a read-only template.  Cache index files are modified in place.
+HARDLINK_DIRS = {"Cache", "Code Cache", "GPUCache", "ScriptCache", "CacheStorage"}
+
+def template_path(name):
+    return PROFILES_PATH / "templates" / name
+
+def capture_profile(user_data_dir, name, max_age=7 * 86400):
+    """
+    Saves a copy of a warmed Chrome user_data_dir as template name, replacing
+    any previous template of that name.  Quit the browser using the profile
+    first, so its files aren't locked or half written.
+
+    Returns
+    -------
+    pathlib.Path:
+        The template directory
+    """
+    clean_profiles(max_age)
+    target = template_path(name)
+    temp = target.with_name(f"{name}.{uuid.uuid4().hex}.tmp")
+    shutil.copytree(user_data_dir, temp, ignore=lambda d, names: [n for n in names if SKIP.match(n)])
+    os.utime(temp)  # Age from capture time, not the source's last change
+    # Read-only so hardlinked clones can't modify the template's files in place:
+    for file in temp.rglob("*"):
+        if file.is_file():
+            file.chmod(stat.S_IREAD)
+    if target.exists():
+        remove_tree(target)
+    temp.rename(target)
+    return target
+
+def copy_file(source, target, reflink=True):
+    """
+    Copies source to target as cheaply as possible.  Returns whether reflinks
+    are still worth trying for subsequent files.
+    """
+    if reflink and fcntl:
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            os.chmod(target, stat.S_IREAD | stat.S_IWRITE)
+            return True
+        except OSError:
+            reflink = False  # Not supported by this filesystem
+            os.unlink(target)
+    if HARDLINK_DIRS.intersection(source.parts) and source.name != "index":
+        try:
+            os.link(source, target)
+            return reflink
+        except OSError:
+            pass
+    shutil.copyfile(source, target)
+    os.chmod(target, stat.S_IREAD | stat.S_IWRITE)
+    return reflink
+
+def clone_profile(name, max_age=7 * 86400):
+    """
+    Returns a new user_data_dir copied from template name, for one browser.
+    Call release_profile() (or quit_browser()) when the browser has quit.
+    The directory name includes this process's pid so copies left behind by
+    crashed processes can be cleaned up.
+    """
+    clean_profiles(max_age)
+    source = template_path(name)
+    if not source.is_dir():
+        raise FileNotFoundError(f"No profile template called {name!r}; use capture_profile() first")
+    target = PROFILES_PATH / "clones" / f"{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    reflink = True
+    for folder, _, files in os.walk(source):
+        folder = Path(folder)
+        (target / folder.relative_to(source)).mkdir(parents=True, exist_ok=True)
+        for file in files:
+            reflink = copy_file(folder / file, target / folder.relative_to(source) / file, reflink)
+    atexit.register(release_profile, target)
+    return target
+
+def release_profile(user_data_dir):
+    """ Deletes a copy made by clone_profile() once its browser has quit """
+    path = Path(user_data_dir)
+    if path.parent == PROFILES_PATH / "clones" and path.exists():
+        remove_tree(path)
+
+def quit_browser(browser):
+    """
+    Quits a selenium browser and releases its profile copy, if it was
+    started with one (see .cleverutils_profile)
+    """
+    try:
+        browser.quit()
+    finally:
+        if getattr(browser, "cleverutils_profile", None):
+            release_profile(browser.cleverutils_profile)
+
+def pid_alive(pid):
+    """ Returns True if a process with this pid is running """
+    if os.name == "nt":
+        return windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+def windows_pid_alive(pid):
+    """
+    pid_alive() for Windows, where os.kill(pid, 0) would send CTRL_C_EVENT
+    instead of checking the process exists
+    """
+    import ctypes
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    ERROR_ACCESS_DENIED = 5
+    STILL_ACTIVE = 259
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access denied means the process exists but belongs to someone else
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+def remove_tree(path):
+    """ shutil.rmtree which also removes read-only files (e.g. on Windows) """
+    def make_writable(func, path, _):
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        func(path)
+    shutil.rmtree(path, onerror=make_writable)
+
+def clean_profiles(max_age=7 * 86400):
+    """
+    Deletes templates captured more than max_age seconds ago, and copies
+    whose process has ended (copies in use are never deleted, however old).
+    Returns the paths deleted.
+    """
+    removed = []
+    cutoff = time.time() - max_age
+    for folder in ("templates", "clones"):
+        for path in (PROFILES_PATH / folder).glob("*"):
+            try:
+                if folder == "clones":
+                    pid = int(path.name.split(".")[-2])
+                    stale = pid != os.getpid() and not pid_alive(pid)
+                else:
+                    stale = path.stat().st_mtime < cutoff
+            except (OSError, ValueError, IndexError):
+                continue
+            if stale:
+                remove_tree(path)
+                removed.append(path)
+    return removed
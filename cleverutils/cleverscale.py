@@ -0,0 +1,170 @@
+"""
+Resource-aware autoscaling for the number of concurrent webbrowsers, based
+on memory and CPU used by each live Chrome (measured from /proc on Linux).
+"""
+import os
+import time
+import threading
+from pathlib import Path
+
+PROC = Path("/proc")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+# Used by initial_max_browsers() before a real browser has been measured:
+DEFAULT_RSS = 300 * 2**20
+DEFAULT_CPU = 0.5
+# Autoscaler's starting limit is no more than this, then grows one at a time:
+START_LIMIT = 5
+
+def read_meminfo():
+    """ Returns {"MemTotal": bytes, "MemAvailable": bytes, ...} from /proc/meminfo """
+    info = {}
+    for line in (PROC / "meminfo").read_text().splitlines():
+        name, value = line.split(":", 1)
+        info[name] = int(value.split()[0]) * 1024
+    return info
+
+def read_stat(pid):
+    """ Returns (parent pid, CPU seconds used) for pid from /proc/<pid>/stat """
+    text = (PROC / str(pid) / "stat").read_text()
+    # Fields after the ")" closing the process name start at field 3 (state)
+    fields = text.rsplit(")", 1)[1].split()
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+def process_tree(pid):
+    """ Returns a list of pid plus all its descendant pids """
+    children = {}
+    for path in PROC.iterdir():
+        if path.name.isdigit():
+            try:
+                ppid, _ = read_stat(path.name)
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(path.name))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+def process_usage(pids):
+    """ Returns (resident memory in bytes, CPU seconds used) summed across pids """
+    rss = cpu = 0
+    for pid in pids:
+        try:
+            rss += int((PROC / str(pid) / "statm").read_text().split()[1]) * PAGE_SIZE
+            cpu += read_stat(pid)[1]
+        except (OSError, IndexError, ValueError):
+            continue  # Process ended while measuring
+    return rss, cpu
+
+def browser_pid(browser):
+    """ Returns the chromedriver pid for a selenium browser, or None """
+    try:
+        return browser.service.process.pid
+    except AttributeError:
+        return None
+
+def initial_max_browsers(default=5, rss=DEFAULT_RSS, cpu=DEFAULT_CPU, target_memory=0.7, target_cpu=0.8):
+    """
+    Estimates a starting max_browsers from free memory and CPU cores before any
+    browser has been measured.  Returns default if /proc isn't available.
+    """
+    try:
+        available = read_meminfo()["MemAvailable"]
+    except (OSError, KeyError):
+        return default
+    by_memory = int(available * target_memory // rss)
+    by_cpu = int((os.cpu_count() or 1) * target_cpu // cpu)
+    return max(1, min(by_memory, by_cpu))
+
+class Autoscaler:
+    """
+    Grows or shrinks a browser limit towards target memory and CPU
+    utilisation, using measurements of each live Chrome's process tree.
+
+    scaler = Autoscaler()
+    cs.max_browsers = scaler.update(cs.browsers)
+    print(scaler.metrics, scaler.history)
+
+    .metrics : latest measurements and limit
+    .history : list of (timestamp, old limit, new limit, reason)
+
+    Unless limit is given, it starts at the lower of START_LIMIT and
+    initial_max_browsers(), and only grows once browsers have been measured.
+    """
+
+    def __init__(self, target_memory=0.7, target_cpu=0.8, min_browsers=1, max_browsers=64, limit=None):
+        self.target_memory = target_memory
+        self.target_cpu = target_cpu
+        self.min_browsers = min_browsers
+        self.max_browsers = max_browsers
+        self.limit = limit or min(START_LIMIT, initial_max_browsers(target_memory=target_memory, target_cpu=target_cpu))
+        self.limit = min(max(self.limit, min_browsers), max_browsers)
+        self.metrics = {"limit": self.limit}
+        self.history = []
+        self.last_sample = {}
+        self.lock = threading.Lock()
+
+    def measure(self, browsers):
+        """
+        Returns (browser count, average RSS bytes, average CPU cores) for live
+        browsers.  CPU is measured since the previous call, so the first call
+        returns None for CPU.
+        """
+        now, usage = time.time(), {}
+        for browser in browsers:
+            pid = browser_pid(browser)
+            if pid:
+                usage[pid] = process_usage(process_tree(pid))
+        if not usage:
+            return 0, None, None
+        rss = sum(r for r, _ in usage.values()) / len(usage)
+        deltas = [(cpu - self.last_sample[pid][1]) / (now - self.last_sample[pid][0])
+                  for pid, (_, cpu) in usage.items()
+                  if pid in self.last_sample and now > self.last_sample[pid][0]]
+        self.last_sample = {pid: (now, cpu) for pid, (_, cpu) in usage.items()}
+        return len(usage), rss, (sum(deltas) / len(deltas) if deltas else None)
+
+    def decide(self, count, rss, cpu, mem_total, mem_available, cpus):
+        """
+        Returns (new limit, reason).  Shrinks straight to a safe limit if
+        memory is over target (to avoid OOM kills), but only grows one browser
+        at a time so measurements can catch up.  Leaves the limit alone until
+        at least one browser has been measured, and ignores CPU until it has
+        been measured (cpu is None).
+        """
+        if not count or not rss:
+            return self.limit, "no browsers measured"
+        # Memory used by everything except our browsers:
+        other = mem_total - mem_available - count * rss
+        by_memory = int((mem_total * self.target_memory - other) // rss)
+        by_cpu = int(cpus * self.target_cpu // cpu) if cpu else self.max_browsers
+        target = min(max(min(by_memory, by_cpu), self.min_browsers), self.max_browsers)
+        bound = "memory" if by_memory <= by_cpu else "CPU"
+        if target < self.limit:
+            cores = f"{cpu:.2f}" if cpu else "unmeasured"
+            return target, f"{bound} over target: {rss / 2**20:,.0f} MiB, {cores} cores per browser"
+        if target > self.limit:
+            return self.limit + 1, f"{bound} headroom for {target} browsers"
+        return self.limit, "at target"
+
+    def update(self, browsers):
+        """
+        Measures live browsers and host resources, updates and returns .limit
+        """
+        with self.lock:
+            try:
+                info = read_meminfo()
+            except (OSError, KeyError):
+                return self.limit  # No /proc e.g. Windows or macOS
+            count, rss, cpu = self.measure(browsers)
+            limit, reason = self.decide(count, rss, cpu, info["MemTotal"], info["MemAvailable"], os.cpu_count() or 1)
+            if limit != self.limit:
+                self.history.append((time.time(), self.limit, limit, reason))
+            self.limit = limit
+            self.metrics = {"limit": limit, "browsers": count, "rss_per_browser": rss,
+                            "cpu_per_browser": cpu, "mem_available": info["MemAvailable"],
+                            "reason": reason}
+            return limit
@@ -13,7 +13,11 @@ import keyring
 from .clevergui import *
 from .cleverweb import *
 from .cleverutils import *
+from .cleverworkers import Coordinator, login_job
+from .cleverscale import Autoscaler
+from .cleverprofiles import clone_profile, quit_browser
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 class CleverSession(CleverDict):
     """
@@ -41,23 +45,84 @@ class CleverSession(CleverDict):
     def __init__(self, **kwargs):
         options, kwargs = self.get_options_from_kwargs(**kwargs)
         super().__init__(**kwargs)
+        # Slow start-up steps run in the background while prompts are shown;
+        # .browser and .wait_for_startup() resolve them when first needed.
+        self.setattr_direct("startup", ThreadPoolExecutor(max_workers=2))
+        self.setattr_direct("username_future", None)
+        self.setattr_direct("browser_future", None)
+        if not kwargs.get("browser"):
+            self.browser_future = self.startup.submit(self.launch_browser, **kwargs)
         start_gui(redirect=kwargs.get("redirect"))
         self.check_and_prompt("url")
         if self.get("url"):
             self.account = CleverSession.choices[self.url]
             self.login_url = self.url
-            self.get_username()
+            self.username_future = self.startup.submit(self.get_username)
+        # Let submitted tasks finish, then release the start-up threads:
+        self.startup.shutdown(wait=False)
         if not self.get("dirpath"):
             self.dirpath_str = str(Path().cwd())
-        self.max_browsers = 5
+        self.setattr_direct("autoscaler", Autoscaler())
+        self.setattr_direct("pinned_max_browsers", bool(kwargs.get("max_browsers")))
+        if not self.pinned_max_browsers:
+            self.max_browsers = self.autoscaler.limit
+        if options.get("timings"):
+            self.setattr_direct("page_timings", PageTimings())
+        if options.get("incremental"):
+            self.setattr_direct("change_store", ChangeStore())
         if kwargs.get("echo") is True:
             setattr(CleverSession, "save", CleverSession.echo_on)
         if kwargs.get("echo") is False:
             setattr(CleverSession, "save", CleverSession.echo_off)
-        self.browser = kwargs.get("browser")
-        if not self.browser:
-            self.browser = webdriver.Chrome(options=disable_logging(**kwargs))
-        self.browser.implicitly_wait(kwargs.get("wait") or 3)
+        if kwargs.get("browser"):
+            self.browser.implicitly_wait(kwargs.get("wait") or 3)
+
+    @property
+    def browser(self):
+        """
+        This @property returns the selenium webbrowser, waiting for it to
+        finish launching in the background if necessary.  Once resolved, the
+        browser is stored as a normal CleverDict item.
+        """
+        future = self.browser_future
+        if future is not None:
+            self.browser = future.result()
+            self.browser_future = None
+        return self.get("browser")
+
+    def launch_browser(self, **kwargs):
+        """
+        Starts a new Chrome webdriver; called in the background by __init__
+
+        profile : name of a profile template (see capture_profile) to start
+                  from a warm copy of, instead of an empty profile
+        """
+        if kwargs.get("profile"):
+            kwargs["user_data_dir"] = str(clone_profile(kwargs["profile"]))
+        browser = webdriver.Chrome(options=disable_logging(**kwargs))
+        browser.cleverutils_profile = kwargs.get("user_data_dir")
+        browser.implicitly_wait(kwargs.get("wait") or 3)
+        return browser
+
+    def quit_browsers(self):
+        """
+        Quits .browser and any .browsers, deleting profile copies made from
+        a profile template.
+        """
+        browsers = getattr(self, "browsers", []) + [self.browser]
+        for browser in {id(b): b for b in browsers if b is not None}.values():
+            quit_browser(browser)
+
+    def wait_for_startup(self, browser=True):
+        """
+        Blocks until background start-up tasks (keyring username lookup and,
+        if browser=True, webbrowser launch) have finished.  Re-raises any
+        exception they hit.
+        """
+        if self.username_future is not None:
+            self.username_future.result()
+            self.username_future = None
+        return self.browser if browser else None
 
     @property
     def dirpath(self):
@@ -71,7 +136,7 @@ class CleverSession(CleverDict):
     def get_options_from_kwargs(self, **kwargs):
         """ Separate actionable options from general data in kwargs."""
         options = {}
-        for key, default_value in {"echo": True, "_break": False, "redirect": False}.items():
+        for key, default_value in {"echo": True, "_break": False, "redirect": False, "timings": False, "incremental": False}.items():
             if isinstance(kwargs.get(key), bool):
                 options[key] = kwargs.get(key)
                 del kwargs[key]
@@ -139,6 +204,21 @@ class CleverSession(CleverDict):
             self.browsers = []
         self.browsers += [self.browser]
 
+    def autoscale(self):
+        """
+        Updates .max_browsers from memory and CPU used by live browsers.
+        See .autoscaler.metrics and .autoscaler.history for reasons.
+
+        A limit set by the user, either with CleverSession(max_browsers=N) or
+        by assigning .max_browsers, is left alone.
+        """
+        if self.pinned_max_browsers or self.get("max_browsers") != self.autoscaler.limit:
+            return self.get("max_browsers")  # Set by the user
+        limit = self.autoscaler.update(getattr(self, "browsers", []))
+        if limit != self.get("max_browsers"):
+            self.max_browsers = limit
+        return limit
+
     @timer
     def login_with_webbrowsers(self, browsers=None):
         """
@@ -148,6 +228,7 @@ class CleverSession(CleverDict):
         browsers : int > number of browsers to run concurrently
         """
         try:
+            self.wait_for_startup()
             self.check_and_prompt("url", "username", "password")
             if not hasattr(self, "browsers"):
                 self.setattr_direct("browsers", [])
@@ -158,6 +239,7 @@ class CleverSession(CleverDict):
                         "192.168.0.1": Login_to.tplink}
             browserThreads = []
             if browsers is None:
+                self.autoscale()
                 browsers = self.get("max_browsers") or 1
             # Adjust if main browser is already be running:
             browsers = browsers - len(self.browsers)
@@ -173,6 +255,61 @@ class CleverSession(CleverDict):
         except WebDriverException:
             raise WebDriverException("Check chromdriver is in your PATH or you're running this code from a directory with chromedriver.exe in it")
 
+    def start_coordinator(self, address=("127.0.0.1", 0), authkey=None, **kwargs):
+        """
+        Starts a Coordinator which hands browser jobs to worker processes.
+        A random authkey is generated for loopback addresses.  To allow
+        workers on other hosts to join, use address=("0.0.0.0", port) with an
+        explicit secret authkey, then on each host:
+
+        python -m cleverutils.cleverworkers --address this_host:port --authkey ...
+        """
+        if not vars(self).get("coordinator"):
+            self.setattr_direct("coordinator", Coordinator(address=address, authkey=authkey, **kwargs).start())
+        return self.coordinator
+
+    def stop_coordinator(self):
+        """ Closes the Coordinator, letting its workers (and browsers) exit """
+        if vars(self).get("coordinator"):
+            self.coordinator.shutdown()
+            self.setattr_direct("coordinator", None)
+
+    def get_login_job(self):
+        """ Returns a (picklable) job for login_job() based on this session """
+        self.wait_for_startup(browser=False)
+        self.check_and_prompt("url", "username")
+        for website, site in {"github.com": "github", "twitter.com": "twitter",
+                              "satchelone.com": "satchelone", "hackerrank.com": "hackerrank",
+                              "192.168.0.1": "tplink"}.items():
+            if website in self.url:
+                return {"site": site, "account": self.account,
+                        "username": self.username, "login_url": self.login_url}
+
+    def run_jobs(self, jobs, workers=2, func=login_job, keep_running=False, idle_timeout=300, **kwargs):
+        """
+        Runs jobs in worker processes, each with its own browser(s), so one
+        crashed browser or process doesn't stop the whole run.
+
+        jobs : list of picklable jobs, each passed to func(browser, job)
+        workers : number of local worker processes to keep running (can be 0
+                  if remote workers have been started separately)
+        keep_running : False -> stop the Coordinator and its workers when the
+                       run finishes; True -> reuse them for the next run (if
+                       it has the same func and kwargs, otherwise the workers
+                       are replaced)
+        idle_timeout : seconds without any job finishing before TimeoutError
+        kwargs : passed to run_worker e.g. browsers=2, heartbeat=5
+
+        Yields (job, result, error) as each job finishes.
+        """
+        coordinator = self.start_coordinator()
+        try:
+            coordinator.start_workers(workers, func=func, **kwargs)
+            yield from coordinator.run(jobs, idle_timeout=idle_timeout)
+        finally:
+            if not keep_running:
+                self.stop_coordinator()
+
     def echo_on(self, name, value):
         """
         Generic confirmation applied CleverDict auto-save with:
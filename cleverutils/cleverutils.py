@@ -6,6 +6,7 @@ import time
 import json
 from pathlib import Path
 import inspect
+import importlib
 from itertools import islice
 import datetime
 from pprint import pprint
@@ -18,6 +19,13 @@ from cleverdict.cleverdict import get_app_dir
 import os
 # import logging
 import re
+import math
+import hashlib
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import wait, FIRST_COMPLETED
 
 INSTALL_PATH = Path(__file__).parent.parent
 ICON_PATH = (Path(__file__).parent).with_name("cleverutils.ico")
@@ -50,6 +58,133 @@ def timer(func):
         return (data)
     return wrapper
 
+def cache_key(func, args, kwargs):
+    """
+    Returns a stable hash of a function's identity and arguments, using
+    convert_to_dict for custom objects so the key is the same across runs.
+    Raises TypeError for arguments without a stable representation e.g.
+    functions, classes, modules, or objects whose repr() includes a memory
+    address.
+    """
+    def default(obj):
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj, key=repr)
+        if callable(obj) or inspect.ismodule(obj):
+            # Functions, classes etc. share an empty or unrelated __dict__
+            raise TypeError(f"No stable cache key for {type(obj).__name__} objects")
+        try:
+            return convert_to_dict(obj)
+        except AttributeError:
+            text = repr(obj)
+            if " at 0x" in text:
+                raise TypeError(f"No stable cache key for {type(obj).__name__} objects")
+            return text
+    text = json.dumps([func.__module__, func.__qualname__, args, kwargs],
+                      default=default, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def same_value(a, b):
+    """
+    Returns True if a and b are equal, comparing custom objects without their
+    own __eq__ by type and attributes (as convert_to_dict would serialise them).
+    """
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same_value(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if type(a).__eq__ is object.__eq__ and hasattr(a, "__dict__"):
+        return same_value(vars(a), vars(b))
+    return a == b
+
+def evict_lru(folder, max_bytes):
+    """
+    Deletes least recently used cache files (oldest modification time first)
+    until the total size of folder is no more than max_bytes.
+    """
+    entries = []
+    for file in folder.glob("*.json"):
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file))
+    total = sum(size for _, size, _ in entries)
+    for _, size, file in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            file.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def disk_cache(func=None, ttl=None, max_bytes=50 * 2**20, cache_dir=None):
+    """
+    Wrapper to memoise func() results to disk so they survive between runs.
+    Designed to work as a decorator, with or without options:
+
+    @disk_cache
+    def example(): ...
+
+    @disk_cache(ttl=3600, max_bytes=10 * 2**20)
+    def example(): ...
+
+    Results are serialised to JSON via convert_to_dict/dict_to_obj, so custom
+    objects work.  Results which don't read back unchanged (e.g. tuples, or
+    dicts with non-string keys), or arguments without a stable representation,
+    are simply not cached.  Each entry is written to a
+    temporary file then renamed, so concurrent threads and processes never see
+    a partial entry.
+
+    kwargs:
+    ttl : Seconds before an entry expires; None -> never expires
+    max_bytes : Least recently used entries are deleted above this total size
+    cache_dir : Defaults to the "disk_cache" folder in get_app_dir("cleverutils")
+    """
+    if func is None:
+        return lambda func: disk_cache(func, ttl=ttl, max_bytes=max_bytes, cache_dir=cache_dir)
+    folder = Path(cache_dir or Path(get_app_dir("cleverutils")) / "disk_cache")
+    folder.mkdir(parents=True, exist_ok=True)
+    def wrapper(*args, **kwargs):
+        try:
+            key = cache_key(func, args, kwargs)
+        except TypeError:
+            return func(*args, **kwargs)  # Can't be cached reliably
+        file_path = folder / f"{key}.json"
+        try:
+            entry = json.loads(file_path.read_text(), object_hook=dict_to_obj)
+            if entry["expires"] is None or entry["expires"] > time.time():
+                os.utime(file_path)  # Mark as recently used
+                return entry["value"]
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Corrupted, or the value can no longer be rebuilt: treat as a miss
+            try:
+                file_path.unlink()
+            except OSError:
+                pass
+        data = func(*args, **kwargs)
+        entry = {"expires": time.time() + ttl if ttl is not None else None, "value": data}
+        try:
+            text = json.dumps(entry, default=convert_to_dict)
+            # Check it reads back unchanged e.g. not {1: "a"} -> {"1": "a"}:
+            if not same_value(json.loads(text, object_hook=dict_to_obj)["value"], data):
+                return data
+        except Exception:
+            return data  # Not serialisable: return without caching
+        temp_path = folder / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        temp_path.write_text(text)
+        os.replace(temp_path, file_path)
+        evict_lru(folder, max_bytes)
+        return data
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.cache_dir = folder
+    return wrapper
+
 def list_batches(data, batch_size=10):
     """ Yields a sublist with batch_size values.
 
@@ -130,6 +265,200 @@ def to_batches(data, batch_size):
     return function_dispatch[type(data)](data, batch_size)
 
 
+POOLS = {}
+POOLS_LOCK = threading.Lock()
+
+def pool_usable(pool):
+    """ Returns False if pool has been shut down, or broken by a crashed worker """
+    if isinstance(pool, asyncio.AbstractEventLoop):
+        return not pool.is_closed()
+    return not (getattr(pool, "_broken", False) or getattr(pool, "_shutdown_thread", False)
+                or getattr(pool, "_shutdown", False))
+
+def get_pool(executor="thread", workers=None):
+    """
+    Returns a reusable worker pool, creating it on first use.  Pools are cached
+    by (executor, workers) so repeated calls to map_batches don't pay the
+    start-up cost of new threads/processes every time.  A pool which has been
+    shut down, or broken by a crashed worker process, is replaced.
+
+    Parameters
+    ----------
+    executor: str
+        "thread" -> concurrent.futures.ThreadPoolExecutor
+        "process" -> concurrent.futures.ProcessPoolExecutor
+        "async" -> an asyncio event loop running in a background thread
+    workers: int | None
+        Maximum number of workers; None -> os.cpu_count()
+
+    Returns
+    -------
+    concurrent.futures.Executor | asyncio.AbstractEventLoop
+    """
+    workers = workers or os.cpu_count() or 1
+    key = (executor, workers)
+    with POOLS_LOCK:
+        if key in POOLS and not pool_usable(POOLS[key]):
+            del POOLS[key]
+        if key in POOLS:
+            return POOLS[key]
+        if executor == "thread":
+            POOLS[key] = ThreadPoolExecutor(max_workers=workers)
+        elif executor == "process":
+            POOLS[key] = ProcessPoolExecutor(max_workers=workers)
+            # Start the worker processes now, so start-up time isn't mistaken
+            # for IPC overhead by map_batches(batch_size="auto"):
+            wait([POOLS[key].submit(int) for _ in range(workers)])
+        elif executor == "async":
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            POOLS[key] = loop
+        else:
+            raise ValueError('executor must be one of "thread", "process", "async"')
+        return POOLS[key]
+
+def timed_call(func, batch):
+    """ Runs func(batch) and returns (seconds taken, result) """
+    start = time.perf_counter()
+    result = func(batch)
+    return time.perf_counter() - start, result
+
+async def timed_coroutine(func, batch):
+    """ Coroutine equivalent of timed_call() for executor="async" """
+    start = time.perf_counter()
+    result = await func(batch)
+    return time.perf_counter() - start, result
+
+def submit_batch(pool, func, batch):
+    """
+    Submits func(batch) to pool and returns a concurrent.futures.Future which
+    resolves to (seconds taken inside the worker, result).
+    """
+    if isinstance(pool, asyncio.AbstractEventLoop):
+        return asyncio.run_coroutine_threadsafe(timed_coroutine(func, batch), pool)
+    return pool.submit(timed_call, func, batch)
+
+def auto_batch_size(item_seconds, overhead_seconds, items, workers, max_overhead=0.05):
+    """
+    Chooses a batch size so that per-batch overhead (IPC, scheduling etc.) is
+    no more than max_overhead of the time spent doing useful work, without
+    making batches so big that some workers are left idle.
+
+    Parameters
+    ----------
+    item_seconds: float
+        Measured time to process a single item inside a worker.
+    overhead_seconds: float
+        Measured round trip time minus item_seconds.
+    items: int
+        Number of items still to be processed.
+    workers: int
+        Number of workers available.
+
+    Returns
+    -------
+    int:
+        A batch size between 1 and items/workers (rounded up).
+    """
+    ceiling = max(1, math.ceil(items / workers))
+    if item_seconds <= 0:
+        return ceiling
+    size = math.ceil(max(overhead_seconds, 0) / (item_seconds * max_overhead))
+    return min(max(size, 1), ceiling)
+
+def map_batches(func, data, batch_size="auto", executor="thread", workers=None, ordered=True, max_in_flight=None):
+    """
+    Splits data into batches with to_batches() and runs func(batch) for each
+    batch in a reusable thread, process, or asyncio pool.  Yields results
+    either in input order or as soon as each batch completes.
+
+    for result in map_batches(do_stuff, data, executor="process"):
+        save(result)
+
+    Parameters
+    ----------
+    func: callable
+        Function which accepts a single batch (same type as data).  Must be
+        picklable e.g. defined at module level if executor="process", or a
+        coroutine function if executor="async".
+    data: dict | list | tuple
+        The source data to be divided into batches.
+    batch_size: int | "auto"
+        Maximum number of items per batch.  "auto" times a single item first
+        and picks a batch size which keeps overhead below 5% of work time.
+    executor: str
+        "thread" | "process" | "async"
+    workers: int
+        Number of workers in the pool; defaults to os.cpu_count()
+    ordered: bool
+        True -> yield results in the same order as the batches
+        False -> yield results as soon as they're available
+    max_in_flight: int
+        Maximum number of batches submitted but not yet yielded, to keep
+        memory usage bounded.  Defaults to 2 x workers.
+
+    Returns
+    -------
+    A generator object of func(batch) results.
+    """
+    # Validate now rather than on the first next() of the generator
+    if executor == "async" and not inspect.iscoroutinefunction(func):
+        raise TypeError('executor="async" requires a coroutine function')
+    if batch_size != "auto":
+        if not isinstance(batch_size, int):
+            raise TypeError('batch_size must be an integer or "auto"')
+        if not batch_size > 0:
+            raise ValueError("batch_size must be positive")
+    workers = workers or os.cpu_count() or 1
+    pool = get_pool(executor, workers)
+    return generate_batch_results(pool, func, data, batch_size, workers, ordered, max_in_flight or 2 * workers)
+
+def generate_batch_results(pool, func, data, batch_size, workers, ordered, max_in_flight):
+    """ Generator used by map_batches() once its arguments have been checked """
+    if not len(data):
+        return
+    pending = deque()
+    if batch_size == "auto":
+        # Probe with a single item to measure work time vs. round trip time
+        probe, data = split_first(data)
+        start = time.perf_counter()
+        seconds, result = submit_batch(pool, func, probe).result()
+        overhead = time.perf_counter() - start - seconds
+        yield result
+        if not len(data):
+            return
+        batch_size = auto_batch_size(seconds, overhead, len(data), workers)
+    for batch in to_batches(data, min(batch_size, len(data))):
+        if len(pending) >= max_in_flight:
+            yield from collect_batches(pending, ordered)
+        pending.append(submit_batch(pool, func, batch))
+    while pending:
+        yield from collect_batches(pending, ordered)
+
+def split_first(data):
+    """ Returns (first item, remaining items) preserving the type of data """
+    if isinstance(data, dict):
+        keys = list(data)
+        first = type(data)({keys[0]: data[keys[0]]})
+        return first, type(data)({k: data[k] for k in keys[1:]})
+    return data[:1], data[1:]
+
+def collect_batches(pending, ordered):
+    """
+    Removes finished futures from pending (a deque) and yields their results.
+    Blocks until at least one result is available.
+    """
+    if ordered:
+        yield pending.popleft().result()[1]
+        while pending and pending[0].done():
+            yield pending.popleft().result()[1]
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in [x for x in pending if x in done]:
+        pending.remove(future)
+        yield future.result()[1]
+
+
 def convert_to_dict(obj):
     """
     A function takes in a custom object and returns a dictionary representation of the object.
@@ -174,8 +503,9 @@ def dict_to_obj(our_dict):
         # Get the module name from the dict and import it
         module_name = our_dict.pop("__module__")
 
-        # We use the built in __import__ function since the module name is not yet known at runtime
-        module = __import__(module_name)
+        # We use importlib since the module name is not yet known at runtime.
+        # Unlike __import__ it returns the submodule for dotted names.
+        module = importlib.import_module(module_name)
 
         # Get the class from the module
         class_ = getattr(module,class_name)
@@ -238,6 +568,111 @@ def get_path_size(path = Path('.'), recursive=False):
         size = sum(file.stat().st_size for file in path_glob)
     return size
 
+def scan_files(path, recursive=True):
+    """ Yields os.DirEntry objects for files under path, using fast os.scandir """
+    try:
+        entries = list(os.scandir(path))
+    except (PermissionError, FileNotFoundError):
+        return
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False):
+                yield entry
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path, recursive)
+        except OSError:
+            continue
+
+def hash_file(path, size, chunk_size=None):
+    """
+    Returns a blake2b hex digest of a file.  If chunk_size is given, only the
+    first and last chunk_size bytes are hashed; otherwise the whole file is
+    streamed in 1 MiB blocks.  Returns None if the file can't be read.
+    """
+    digest = hashlib.blake2b(str(size).encode())
+    try:
+        with open(path, "rb") as file:
+            if chunk_size and size > 2 * chunk_size:
+                digest.update(file.read(chunk_size))
+                file.seek(-chunk_size, os.SEEK_END)
+                digest.update(file.read(chunk_size))
+            else:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def group_by_hash(candidates, workers, chunk_size=None):
+    """
+    Hashes each group of same-sized files in a thread pool and returns a
+    list of groups (lists of (path, size) tuples) which still collide.
+    """
+    items = [item for group in candidates for item in group]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = pool.map(lambda x: hash_file(x[0], x[1], chunk_size), items)
+    groups = {}
+    for (path, size), digest in zip(items, digests):
+        if digest is not None:
+            groups.setdefault((size, digest), []).append((path, size))
+    return [group for group in groups.values() if len(group) > 1]
+
+def find_duplicates(path=Path('.'), recursive=True, min_size=1, chunk_size=4096, workers=None, unit="MB"):
+    """
+    Finds duplicate files in stages so that most files are never read:
+
+    1. Group files by size (from directory metadata only)
+    2. For sizes shared by 2+ files, hash the first and last chunk_size bytes
+    3. For files still colliding, hash the whole file
+
+    Hard links to the same file are only counted once (except on Windows,
+    where directory metadata doesn't include inode numbers).
+
+    Parameters
+    ----------
+    path: str | pathlib.Path
+        Directory/folder path to search
+    recursive: bool
+        True -> include nested directories
+    min_size: int
+        Ignore files smaller than this many bytes (default: skip empty files)
+    chunk_size: int
+        Bytes hashed from each end of a file in stage 2
+    workers: int
+        Threads for hashing; defaults to 4 x os.cpu_count() as it's I/O bound
+    unit: str
+        Unit for .reclaimable_formatted; see cleverutils.format_bytes
+
+    Returns
+    -------
+    CleverDict:
+        .groups : list of lists of pathlib.Path objects with identical content
+        .reclaimable : bytes that could be freed by keeping one of each group
+        .reclaimable_formatted : .reclaimable via format_bytes e.g. "7 MB"
+    """
+    workers = workers or 4 * (os.cpu_count() or 1)
+    by_size, inodes = {}, set()
+    for entry in scan_files(path, recursive):
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue  # Deleted or unreadable since scandir
+        if stat.st_size < min_size or (stat.st_dev, stat.st_ino) in inodes:
+            continue
+        if stat.st_ino:  # DirEntry.stat() leaves st_ino as 0 on Windows
+            inodes.add((stat.st_dev, stat.st_ino))
+        by_size.setdefault(stat.st_size, []).append((entry.path, stat.st_size))
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    candidates = group_by_hash(candidates, workers, chunk_size)
+    # Files <= 2 x chunk_size were hashed in full already
+    done = [group for group in candidates if group[0][1] <= 2 * chunk_size]
+    remaining = [group for group in candidates if group[0][1] > 2 * chunk_size]
+    groups = done + group_by_hash(remaining, workers)
+    reclaimable = sum(group[0][1] * (len(group) - 1) for group in groups)
+    return CleverDict({"groups": [sorted(Path(p) for p, _ in group) for group in groups],
+                       "reclaimable": reclaimable,
+                       "reclaimable_formatted": format_bytes(reclaimable, unit)})
+
 def format_bytes(bytes, unit, SI=False):
     """
     Converts bytes to common units such as kb, kib, KB, mb, mib, MB
@@ -1,18 +1,383 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import WebDriverException, NoSuchElementException, TimeoutException
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions
 import time
+import csv
+import json
+import os
+import hashlib
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from cleverdict.cleverdict import get_app_dir
+from .cleverutils import CleverDict
 
 def disable_logging(**kwargs):
-    """ Experimental: run selenium in silent mode """
+    """
+    Experimental: run selenium in silent mode
+
+    user_data_dir : Chrome profile directory to use e.g. from clone_profile()
+    """
     options = webdriver.ChromeOptions()
     options.headless = kwargs.get("headless")
     options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    if kwargs.get("user_data_dir"):
+        options.add_argument(f"--user-data-dir={kwargs['user_data_dir']}")
     return options
 
+NAVIGATION_TIMING_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource').map(function(r) {
+    return {name: r.name, initiatorType: r.initiatorType,
+            duration: r.duration, transferSize: r.transferSize || 0};
+});
+return {navigation: nav ? nav.toJSON() : null, resources: resources};
+"""
+
+class PageTimings:
+    """
+    Collects Navigation Timing and Resource Timing data from the browser after
+    each page load made with get_page(), so slow logins can be attributed to
+    DNS, TLS, server time, DOM parsing, or our own waits.
+
+    Enable with CleverSession(timings=True) then e.g.
+
+    cs.page_timings.summary()
+    cs.page_timings.to_csv("timings.csv")
+
+    All durations are in milliseconds.
+    """
+    metrics = ["redirect", "dns", "connect", "tls", "server", "download",
+               "dom_parse", "dom_content_loaded", "load", "resources",
+               "resource_bytes", "get"]
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def capture(self, browser, site, step, get_ms=0):
+        """
+        Reads Navigation/Resource Timing data with a single execute_script
+        call and stores a record of the derived metrics.
+        """
+        try:
+            data = browser.execute_script(NAVIGATION_TIMING_JS) or {}
+        except WebDriverException:
+            data = {}
+        nav = data.get("navigation") or {}
+        resources = data.get("resources") or []
+        def span(end, start):
+            return max(nav.get(end, 0) - nav.get(start, 0), 0)
+        tls = span("connectEnd", "secureConnectionStart") if nav.get("secureConnectionStart") else 0
+        record = {"site": site, "step": step, "url": nav.get("name", ""),
+                  "redirect": span("redirectEnd", "redirectStart"),
+                  "dns": span("domainLookupEnd", "domainLookupStart"),
+                  "connect": span("connectEnd", "connectStart"),
+                  "tls": tls,
+                  "server": span("responseStart", "requestStart"),
+                  "download": span("responseEnd", "responseStart"),
+                  "dom_parse": span("domInteractive", "responseEnd"),
+                  "dom_content_loaded": nav.get("domContentLoadedEventEnd", 0),
+                  "load": nav.get("loadEventEnd", 0),
+                  "resources": len(resources),
+                  "resource_bytes": sum(r.get("transferSize", 0) for r in resources),
+                  "get": get_ms}
+        with self.lock:
+            self.records.append(record)
+        return record
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        Returns a dict of {(site, step): {metric: {"p50": value, ...}}} plus
+        a "count" of page loads for each site and step.
+        """
+        groups = {}
+        with self.lock:
+            for record in self.records:
+                groups.setdefault((record["site"], record["step"]), []).append(record)
+        result = {}
+        for key, records in groups.items():
+            result[key] = {"count": len(records)}
+            for metric in PageTimings.metrics:
+                values = sorted(r[metric] for r in records)
+                result[key][metric] = {f"p{p}": percentile(values, p) for p in percentiles}
+        return result
+
+    def summary_rows(self, percentiles=(50, 90, 99)):
+        """ Flattens summary() into a list of dicts, one per site/step/metric """
+        rows = []
+        for (site, step), metrics in self.summary(percentiles).items():
+            for metric in PageTimings.metrics:
+                rows.append({"site": site, "step": step, "metric": metric,
+                             "count": metrics["count"], **metrics[metric]})
+        return rows
+
+    def to_csv(self, file_path, raw=False):
+        """ Writes summary rows (or raw records if raw=True) to file_path """
+        rows = self.records if raw else self.summary_rows()
+        if not rows:
+            return
+        with open(Path(file_path), "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def to_json(self, file_path, raw=False):
+        """ Writes summary rows (or raw records if raw=True) to file_path """
+        rows = self.records if raw else self.summary_rows()
+        Path(file_path).write_text(json.dumps(rows, indent=4))
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of an already sorted list of numbers using
+    linear interpolation between closest ranks.
+    """
+    if not values:
+        return 0
+    rank = (len(values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+def get_page(self, url, step="get"):
+    """
+    Loads url in self.browser (for a CleverSession object, self) and if
+    self.page_timings is set, captures the browser's Navigation/Resource
+    Timing data for that page afterwards.
+    """
+    start = time.perf_counter()
+    self.browser.get(url)
+    timings = getattr(self, "page_timings", None)
+    if timings:
+        site = self.get("account") or urlparse(url).netloc or url
+        timings.capture(self.browser, site, step, (time.perf_counter() - start) * 1000)
+
+class ChangeStore:
+    """
+    Remembers the ETag, Last-Modified header, and content hash for each URL
+    scraped, so re-runs can use conditional requests and skip extraction and
+    downstream writes for pages which haven't changed.
+
+    Enable with CleverSession(incremental=True), then after scraping:
+
+    print(cs.change_store.report())
+    cs.change_store.save()
+    """
+
+    def __init__(self, file_path=None):
+        self.file_path = Path(file_path or Path(get_app_dir("cleverutils")) / "change_store.json")
+        self.lock = threading.Lock()
+        self.counts = {"changed": 0, "skipped": 0}
+        try:
+            self.pages = json.loads(self.file_path.read_text())
+        except (OSError, ValueError):
+            self.pages = {}
+
+    def headers(self, url):
+        """ Returns conditional request headers for url, if known """
+        page = self.pages.get(url, {})
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def skipped(self, url):
+        """ Records url as unchanged (e.g. after 304 Not Modified) """
+        with self.lock:
+            self.counts["skipped"] += 1
+
+    def update(self, url, content, etag=None, last_modified=None):
+        """
+        Stores the latest validators and content hash for url.
+        Returns True if the content has changed since last time.
+        """
+        if isinstance(content, str):
+            content = content.encode()
+        digest = hashlib.blake2b(content).hexdigest()
+        with self.lock:
+            changed = self.pages.get(url, {}).get("hash") != digest
+            self.pages[url] = {"hash": digest, "etag": etag, "last_modified": last_modified}
+            self.counts["changed" if changed else "skipped"] += 1
+        return changed
+
+    def report(self):
+        return f"{self.counts['changed']} pages changed, {self.counts['skipped']} skipped"
+
+    def save(self):
+        """ Saves validators and hashes to .file_path for the next run """
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.file_path.with_suffix(f".{os.getpid()}.tmp")
+        with self.lock:
+            temp_path.write_text(json.dumps(self.pages, indent=4))
+        os.replace(temp_path, self.file_path)
+
+EXTRACT_JS = """
+var spec = arguments[0], result = {};
+Object.keys(spec).forEach(function(name) {
+    var fields = spec[name], items = [];
+    var nodes = document.querySelectorAll(fields.selector);
+    var limit = Math.min(nodes.length, fields.limit || nodes.length);
+    for (var i = 0; i < limit; i++) {
+        var node = nodes[i], item = {};
+        if (fields.text !== false) {
+            item.text = (node.innerText || node.textContent || "").trim();
+        }
+        (fields.attributes || []).forEach(function(attribute) {
+            // .href and .src properties return absolute URLs
+            item[attribute] = (attribute == "href" || attribute == "src") ?
+                node[attribute] : node.getAttribute(attribute);
+        });
+        items.push(item);
+    }
+    result[name] = items;
+});
+return result;
+"""
+
+# Hidden elements (no client rects) are skipped, as selenium's .text is empty
+# for them, but innerText falls back to their textContent:
+FIND_BY_TEXT_JS = """
+var nodes = document.getElementsByTagName(arguments[0]);
+for (var i = 0; i < nodes.length; i++) {
+    if (nodes[i].getClientRects().length == 0) {
+        continue;
+    }
+    if ((nodes[i].innerText || "").trim() == arguments[1]) {
+        return nodes[i];
+    }
+}
+return null;
+"""
+
+def extract(browser, spec):
+    """
+    Extracts text, attributes, and links for all elements matching each CSS
+    selector in spec with a single execute_script call, rather than one
+    WebDriver round trip per element and per .text/.get_attribute().
+
+    Parameters
+    ----------
+    browser: selenium webbrowser object
+    spec: dict
+        {name: "css selector"} for text only, or
+        {name: {"selector": "css selector",
+                "attributes": ["href", ...],  # optional
+                "text": False,  # optional; default True
+                "limit": 10}}  # optional; max elements returned
+
+    Returns
+    -------
+    dict:
+        {name: [{"text": ..., "href": ...}, ...]}
+    """
+    spec = {k: {"selector": v} if isinstance(v, str) else v for k, v in spec.items()}
+    return browser.execute_script(EXTRACT_JS, spec) or {}
+
+def find_by_text(browser, tag_name, text):
+    """
+    Returns the first element with tag_name whose visible text equals text,
+    using a single execute_script call rather than reading .text for every
+    element with that tag.
+    """
+    element = browser.execute_script(FIND_BY_TEXT_JS, tag_name, text)
+    if element is None:
+        raise NoSuchElementException(f"No <{tag_name}> with text {text!r}")
+    return element
+
+class TabPool:
+    """
+    Runs page loads in several tabs of one (logged-in) browser instead of
+    several browsers, so all tabs share the same authenticated profile for
+    roughly the memory of one browser.
+
+    Navigation is started in each tab with a non-blocking script, then tabs
+    are polled round-robin and whichever has finished loading is processed
+    with func(browser, url) while it's the current window.
+
+    with TabPool(cs.browser, tabs=4) as pool:
+        for url, result in pool.map(urls):
+            ...
+
+    .load_ms : milliseconds the current page took to load, set before func
+               is called for it
+    """
+    NAVIGATE_JS = "document.__cleverutils_tab = true; window.location.href = arguments[0];"
+    # A new document won't have the marker set by NAVIGATE_JS.  It's set on
+    # document rather than window because navigating from a tab's initial
+    # about:blank to a same-origin page keeps the same window object:
+    READY_JS = "return document.__cleverutils_tab === undefined && document.readyState == 'complete';"
+
+    def __init__(self, browser, tabs=4):
+        self.browser = browser
+        self.main_window = browser.current_window_handle
+        existing = set(browser.window_handles)
+        for _ in range(tabs - 1):
+            browser.execute_script("window.open('about:blank');")
+        self.handles = [self.main_window] + [h for h in browser.window_handles if h not in existing]
+        self.load_ms = 0
+
+    def map(self, urls, func=None, poll=0.05, timeout=30):
+        """
+        Loads urls across tabs and yields (url, func(browser, url)) in order
+        of completion.  func defaults to extract() with Scrape.page's spec.
+        Raises TimeoutException if a page takes longer than timeout seconds.
+        """
+        func = func or (lambda browser, url: extract(browser, Scrape.default_spec))
+        queue, busy = list(urls)[::-1], {}  # busy = {handle: (url, started)}
+        while queue or busy:
+            for handle in self.handles:
+                if handle not in busy and queue:
+                    url = queue.pop()
+                    self.browser.switch_to.window(handle)
+                    self.browser.execute_script(TabPool.NAVIGATE_JS, url)
+                    busy[handle] = (url, time.perf_counter())
+            finished = False
+            for handle, (url, started) in list(busy.items()):
+                self.browser.switch_to.window(handle)
+                if self.browser.execute_script(TabPool.READY_JS):
+                    del busy[handle]
+                    finished = True
+                    self.load_ms = (time.perf_counter() - started) * 1000
+                    yield url, func(self.browser, url)
+                elif time.perf_counter() - started > timeout:
+                    raise TimeoutException(f"{url} took more than {timeout} seconds to load")
+            if not finished:
+                time.sleep(poll)
+
+    def close(self):
+        """ Closes the extra tabs and switches back to the original window """
+        for handle in self.handles[1:]:
+            self.browser.switch_to.window(handle)
+            self.browser.close()
+        self.browser.switch_to.window(self.main_window)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class BasicSession(CleverDict):
+    """
+    The minimum of CleverSession needed by Login_to and Scrape functions,
+    without GUI prompts or keyring lookups e.g. for worker processes and
+    benchmarks.  Typically created with .browser, .username, .password,
+    .account, and .login_url already set.
+    """
+
+    def add_current_browser(self):
+        """Appends the current (login) browser to self.browsers"""
+        if not hasattr(self, "browsers"):
+            self.browsers = []
+        self.browsers += [self.browser]
+
 class Login_to:
     """
     A collection of common login functions for a variety of websites.
@@ -26,7 +391,15 @@ class Login_to:
 
     the .add_current_browser() method appends the current (login) browser to
     self.browsers list.
+
+    Pages are loaded with get_page() so they can be timed with PageTimings.
+
+    login_pages maps CleverSession.choices URLs to the actual login page
+    where that differs; any other .login_url (e.g. a local stand-in site for
+    benchmarking) is used as is.
     """
+    login_pages = {"192.168.0.1": r"http://192.168.0.1/login.html",
+                   "https://www.hackerrank.com": r"https://www.hackerrank.com/auth/login?h_l=body_middle_left_button&h_r=login"}
 
 
     @staticmethod
@@ -34,8 +407,8 @@ class Login_to:
         """
         Use selenium and CleverSession credentials to login to tplink modem
         """
-        self.login_url = r"http://192.168.0.1/login.html"
-        self.browser.get(self.login_url)
+        self.login_url = Login_to.login_pages.get(self.login_url, self.login_url)
+        get_page(self, self.login_url, "login")
         self.browser.find_element_by_id("password").send_keys(self.password)
         self.browser.find_element_by_id("loginBtn").click()
         self.add_current_browser()
@@ -43,8 +416,8 @@ class Login_to:
     @staticmethod
     def hackerrank(self, **kwargs):
         """ Use selenium and CleverSession credentials to login to HackerRank """
-        self.login_url = r"https://www.hackerrank.com/auth/login?h_l=body_middle_left_button&h_r=login"
-        self.browser.get(self.login_url)
+        self.login_url = Login_to.login_pages.get(self.login_url, self.login_url)
+        get_page(self, self.login_url, "login")
         self.browser.find_element_by_id("input-1").send_keys(self.username)
         self.browser.find_element_by_id("input-2").send_keys(self.password)
         self.browser.find_element_by_xpath('//*[@id="tab-1-content-1"]/div[1]/form/div[4]/button').click()
@@ -54,7 +427,7 @@ class Login_to:
     @staticmethod
     def github(self, **kwargs):
         """ Use selenium and CleverSession credentials to login to Github """
-        self.browser.get(self.login_url)
+        get_page(self, self.login_url, "login")
         self.browser.find_element_by_id("login_field").send_keys(self.username)
         self.browser.find_element_by_id("password").send_keys(self.password)
         self.browser.find_element_by_name("commit").click()
@@ -63,17 +436,16 @@ class Login_to:
     @staticmethod
     def twitter(self, **kwargs):
         """ Use selenium and CleverSession credentials to login to Github """
-        self.browser.get(self.login_url)
+        get_page(self, self.login_url, "login")
         self.browser.find_element_by_name("session[username_or_email]").send_keys(self.username)
         self.browser.find_element_by_name("session[password]").send_keys(self.password)
-        span = self.browser.find_elements_by_tag_name("span")
-        [x for x in span if x.text=="Log in"][0].click()
+        find_by_text(self.browser, "span", "Log in").click()
         self.add_current_browser()
 
     @staticmethod
     def office365(self, **kwargs):
         """ Use selenium and CleverSession credentials to login to Office365 """
-        self.browser.get(self.login_url)
+        get_page(self, self.login_url, "office365")
         self.browser.find_element_by_id("i0116").send_keys(self.username)
         self.browser.find_element_by_id("idSIButton9").click()
         self.browser.find_element_by_id("i0118").send_keys(self.password)
@@ -87,10 +459,9 @@ class Login_to:
         """ Use selenium and CleverSession credentials to login to SatchelOne
         """
         # from satchelone_config import userid, pw
-        self.browser.get(self.login_url)
+        get_page(self, self.login_url, "login")
         main_window = self.browser.window_handles[0]
-        span = self.browser.find_elements_by_tag_name("span")
-        [x for x in span if x.text=="Sign in with Office 365"][0].click()
+        find_by_text(self.browser, "span", "Sign in with Office 365").click()
         popup_window = self.browser.window_handles[1]
         self.browser.switch_to.window(popup_window)
         Login_to.office365()
@@ -107,8 +478,73 @@ class Scrape:
     websites.  Each receives a (CleverSession) object (self) as its argument, typically comprising:
 
     .browser : a selenium webbrowswer object that has already been initialised
+
+    Use get_page(self, url, step) rather than .browser.get(url) so that page
+    loads can be timed with PageTimings.
     """
+    default_spec = {"title": "title",
+                    "headings": "h1, h2, h3",
+                    "links": {"selector": "a[href]", "attributes": ["href"]}}
 
     @staticmethod
     def tplink(self, **kwargs):
         return
+
+    @staticmethod
+    def fetch(self, url, **kwargs):
+        """
+        Lightweight HTTP GET without a browser.  If self.change_store is set,
+        sends conditional request headers and returns None when the server
+        replies 304 Not Modified or the content hash is unchanged.
+        """
+        store = getattr(self, "change_store", None)
+        headers = store.headers(url) if store else {}
+        try:
+            with urlopen(Request(url, headers=headers), timeout=kwargs.get("timeout") or 30) as response:
+                content = response.read()
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        except HTTPError as error:
+            if error.code == 304 and store:
+                store.skipped(url)
+                return None
+            raise
+        if store and not store.update(url, content, etag, last_modified):
+            return None
+        return content.decode(errors="replace")
+
+    @staticmethod
+    def page(self, url, spec=None, **kwargs):
+        """
+        Loads url and returns the results of extract() for spec, by default
+        the page title, headings, and all links.  If self.change_store is set,
+        returns None without extracting when the page source is unchanged.
+        """
+        get_page(self, url, kwargs.get("step") or "scrape")
+        store = getattr(self, "change_store", None)
+        if store and not store.update(url, self.browser.page_source):
+            return None
+        return extract(self.browser, spec or Scrape.default_spec)
+
+    @staticmethod
+    def pages(self, urls, spec=None, tabs=4, **kwargs):
+        """
+        Loads urls in tabs of self.browser (see TabPool) and returns
+        {url: extract() results}.  Pages unchanged since the last run are
+        left out if self.change_store is set.  Page loads are timed if
+        self.page_timings is set, like get_page().
+
+        kwargs: step (for PageTimings), poll and timeout (for TabPool.map)
+        """
+        store = getattr(self, "change_store", None)
+        timings = getattr(self, "page_timings", None)
+        def process(browser, url):
+            if timings:
+                site = self.get("account") or urlparse(url).netloc or url
+                timings.capture(browser, site, kwargs.get("step") or "scrape", pool.load_ms)
+            if store and not store.update(url, browser.page_source):
+                return None
+            return extract(browser, spec or Scrape.default_spec)
+        options = {k: v for k, v in kwargs.items() if k in ("poll", "timeout")}
+        with TabPool(self.browser, tabs) as pool:
+            return {url: result for url, result in pool.map(urls, process, **options)
+                    if result is not None}
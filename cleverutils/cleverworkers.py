@@ -0,0 +1,312 @@
+"""
+Multi-process / multi-host worker mode for webbrowser jobs.
+
+A Coordinator runs a JobBroker in a multiprocessing manager server which
+worker processes connect to over a socket (localhost or another host).
+Each worker owns its own browsers, sends regular heartbeats, and has its
+jobs re-queued for other workers if it stops responding.
+
+Manager connections exchange pickles, so anyone who can connect with the
+authkey can run code on the coordinator and workers.  Coordinators bound to
+a loopback address generate a random authkey; any other address needs an
+explicit (secret) authkey.  Start extra workers on other hosts with:
+
+python -m cleverutils.cleverworkers --address coordinator_host:50000 --authkey secret
+"""
+import argparse
+import ipaddress
+import itertools
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from importlib import import_module
+from multiprocessing.managers import BaseManager
+import keyring
+from selenium import webdriver
+from .cleverweb import BasicSession, Login_to, disable_logging
+from .cleverprofiles import clone_profile, quit_browser
+
+class JobBroker:
+    """
+    Thread-safe job queue with heartbeats, shared between the coordinator and
+    workers via BrokerManager.  Jobs held by a worker which hasn't sent a
+    heartbeat for .timeout seconds are put back in the queue, up to
+    .max_attempts times per job.
+
+    Workers started for a particular .generation stop taking jobs once
+    retire_workers() starts a new one (workers with generation=None, e.g.
+    remote workers, take jobs until the broker closes).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.running = {}  # job_id: (worker_id, job, attempts)
+        self.results = {}  # job_id: (job, result, error)
+        self.heartbeats = {}
+        self.counter = itertools.count()
+        self.timeout = 15
+        self.max_attempts = 3
+        self.closed = False
+        self.generation = 0
+
+    def configure(self, timeout=15, max_attempts=3):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+    def put_job(self, job):
+        """ Adds job to the queue and returns its job_id """
+        with self.lock:
+            job_id = next(self.counter)
+            self.pending.append((job_id, job, 0))
+            return job_id
+
+    def get_job(self, worker_id, generation=None):
+        """
+        Returns (job_id, job) for worker_id to run, or None if none waiting
+        (or the worker's generation has been retired)
+        """
+        with self.lock:
+            self.heartbeats[worker_id] = time.time()
+            self.requeue_dead()
+            if not self.pending or generation not in (None, self.generation):
+                return None
+            job_id, job, attempts = self.pending.popleft()
+            self.running[job_id] = (worker_id, job, attempts + 1)
+            return job_id, job
+
+    def heartbeat(self, worker_id):
+        with self.lock:
+            self.heartbeats[worker_id] = time.time()
+
+    def put_result(self, job_id, result=None, error=None):
+        with self.lock:
+            if job_id in self.running:
+                _, job, _ = self.running.pop(job_id)
+                self.results[job_id] = (job, result, error)
+
+    def requeue_dead(self):
+        """ Re-queues jobs from workers with no recent heartbeat; needs self.lock """
+        cutoff = time.time() - self.timeout
+        dead = {w for w, seen in self.heartbeats.items() if seen < cutoff}
+        for job_id, (worker_id, job, attempts) in list(self.running.items()):
+            if worker_id in dead:
+                del self.running[job_id]
+                if attempts < self.max_attempts:
+                    self.pending.appendleft((job_id, job, attempts))
+                else:
+                    self.results[job_id] = (job, None, f"Worker {worker_id} died {attempts} times")
+        for worker_id in dead:
+            del self.heartbeats[worker_id]
+
+    def pop_results(self):
+        """ Returns and removes finished {job_id: (job, result, error)} """
+        with self.lock:
+            self.requeue_dead()
+            results, self.results = self.results, {}
+            return results
+
+    def status(self):
+        with self.lock:
+            return {"pending": len(self.pending), "running": len(self.running),
+                    "finished": len(self.results), "workers": len(self.heartbeats)}
+
+    def retire_workers(self):
+        """ Starts a new generation of workers and returns its number """
+        with self.lock:
+            self.generation += 1
+            return self.generation
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self, generation=None):
+        return self.closed or generation not in (None, self.generation)
+
+BROKER = JobBroker()
+
+def get_broker():
+    """ Returns the JobBroker living in the manager server process """
+    return BROKER
+
+class BrokerManager(BaseManager):
+    pass
+
+BrokerManager.register("get_broker", callable=get_broker)
+
+class Coordinator:
+    """
+    Hands jobs to worker processes (local or remote) and collects results.
+
+    coordinator = Coordinator(address=("0.0.0.0", 50000), authkey=secret).start()
+    coordinator.start_workers(2, func=login_job)
+    for job, result, error in coordinator.run(jobs):
+        ...
+    coordinator.shutdown()
+
+    authkey : required unless address is a loopback address, in which case
+              a random key is generated (see .authkey)
+    """
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=None, timeout=15, max_attempts=3):
+        if authkey is None:
+            if not is_loopback(address[0]):
+                raise ValueError(f"An explicit authkey is needed to listen on {address[0]!r}")
+            authkey = os.urandom(32)
+        self.manager = BrokerManager(address=address, authkey=authkey)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.processes = []
+        self.worker_kwargs = None
+        self.generation = None
+
+    def start(self):
+        self.manager.start()
+        self.broker = self.manager.get_broker()
+        self.broker.configure(self.timeout, self.max_attempts)
+        return self
+
+    @property
+    def address(self):
+        return self.manager.address
+
+    def start_workers(self, count, **kwargs):
+        """
+        Starts local worker processes until count are running; kwargs are
+        passed to run_worker.  Running workers are only reused if they were
+        started with the same kwargs (func, launch, browsers etc.); otherwise
+        they finish their current job and exit, and new ones are started.
+        """
+        if kwargs != self.worker_kwargs:
+            self.generation = self.broker.retire_workers()
+            for process in self.processes:
+                process.join(self.timeout)
+            self.processes = []
+            self.worker_kwargs = kwargs
+        self.processes = [p for p in self.processes if p.is_alive()]
+        for _ in range(count - len(self.processes)):
+            process = multiprocessing.Process(target=run_worker, args=[self.address, self.authkey],
+                                              kwargs={**kwargs, "generation": self.generation}, daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def run(self, jobs, poll=0.1, idle_timeout=300):
+        """
+        Submits jobs and yields (job, result, error) as each finishes, in
+        order of completion.  Raises TimeoutError if no job finishes for
+        idle_timeout seconds e.g. because no workers have connected.
+        """
+        remaining = {self.broker.put_job(job) for job in jobs}
+        last_progress = time.time()
+        while remaining:
+            finished = self.broker.pop_results()
+            for job_id, (job, result, error) in finished.items():
+                remaining.discard(job_id)
+                yield job, result, error
+            if finished:
+                last_progress = time.time()
+            elif time.time() - last_progress > idle_timeout:
+                status = self.broker.status()
+                raise TimeoutError(f"No jobs finished in {idle_timeout} seconds: {status}")
+            else:
+                time.sleep(poll)
+
+    def shutdown(self):
+        self.broker.close()
+        for process in self.processes:
+            process.join(self.timeout)
+        self.manager.shutdown()
+
+def is_loopback(host):
+    """ Returns True if host (name or IP address) resolves to a loopback address """
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+def launch_chrome(headless=True, wait=3, profile=None):
+    """
+    Default browser factory for workers.  profile is the name of a profile
+    template to start each browser from a warm copy of.
+    """
+    user_data_dir = clone_profile(profile) if profile else None
+    browser = webdriver.Chrome(options=disable_logging(headless=headless, user_data_dir=user_data_dir))
+    browser.cleverutils_profile = user_data_dir
+    browser.implicitly_wait(wait)
+    return browser
+
+def login_job(browser, job):
+    """
+    Default worker function: logs in with Login_to.<job["site"]>.  The
+    password is read from the worker host's own keyring, so it never has to
+    travel over the network.
+    """
+    session = BasicSession(browser=browser, **job)
+    if not session.get("password"):
+        session.password = keyring.get_password(job["account"], job["username"])
+    getattr(Login_to, job["site"])(session)
+    return session.browser.current_url
+
+def run_worker(address, authkey, func=login_job, browsers=1, launch=launch_chrome, heartbeat=5, poll=0.5, generation=None):
+    """
+    Connects to a Coordinator at address and runs func(browser, job) for jobs
+    until the coordinator closes (or retires this worker's generation).  Each
+    of this worker's browsers runs in its own thread; results (or errors) are
+    returned to the coordinator.
+    """
+    manager = BrokerManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    broker = manager.get_broker()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(heartbeat):
+            broker.heartbeat(worker_id)
+
+    def work():
+        browser = launch() if launch else None
+        try:
+            while not broker.is_closed(generation):
+                assignment = broker.get_job(worker_id, generation)
+                if assignment is None:
+                    time.sleep(poll)
+                    continue
+                job_id, job = assignment
+                try:
+                    broker.put_result(job_id, func(browser, job))
+                except Exception as error:
+                    broker.put_result(job_id, error=repr(error))
+        finally:
+            if browser is not None:
+                quit_browser(browser)
+
+    threading.Thread(target=beat, daemon=True).start()
+    threads = [threading.Thread(target=work) for _ in range(browsers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a cleverutils browser worker")
+    parser.add_argument("--address", default="127.0.0.1:50000", help="host:port of the Coordinator")
+    parser.add_argument("--authkey", default=os.environ.get("CLEVERUTILS_AUTHKEY"),
+                        help="Coordinator's authkey (or set CLEVERUTILS_AUTHKEY)")
+    parser.add_argument("--browsers", type=int, default=1)
+    parser.add_argument("--func", default="cleverutils.cleverworkers:login_job", help="module:function to run for each job")
+    parser.add_argument("--headed", action="store_true", help="Show browser windows")
+    parser.add_argument("--profile", help="Name of a profile template to copy for each browser")
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error("--authkey or CLEVERUTILS_AUTHKEY is required")
+    host, port = args.address.rsplit(":", 1)
+    module, name = args.func.split(":")
+    run_worker((host, int(port)), args.authkey.encode(), func=getattr(import_module(module), name),
+               browsers=args.browsers, launch=lambda: launch_chrome(headless=not args.headed, profile=args.profile))
@@ -52,6 +52,56 @@ class Test_Batches:
                     b = to_batches(test, batch_size)
                     results = generate_all_batches(b)
 
+async def async_sum(batch):
+    return sum(batch)
+
+def crash(batch):
+    os._exit(1)
+
+class Test_map_batches:
+    numbers = list(range(100))
+
+    def test_ordered(self):
+        for executor in ("thread", "process"):
+            results = list(map_batches(sum, self.numbers, 10, executor, workers=2))
+            assert results == [sum(self.numbers[i:i+10]) for i in range(0, 100, 10)]
+
+    def test_unordered(self):
+        results = map_batches(sum, self.numbers, 7, ordered=False, max_in_flight=3)
+        assert sum(results) == sum(self.numbers)
+
+    def test_async(self):
+        results = list(map_batches(async_sum, self.numbers, 25, "async"))
+        assert results == [sum(self.numbers[i:i+25]) for i in range(0, 100, 25)]
+        with pytest.raises(TypeError):
+            map_batches(sum, self.numbers, 25, "async")
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            map_batches(sum, self.numbers, 10, "fibre")
+        with pytest.raises(ValueError):
+            map_batches(sum, self.numbers, 0)
+        with pytest.raises(TypeError):
+            map_batches(sum, self.numbers, "text")
+
+    def test_auto(self):
+        results = list(map_batches(len, test_dict, workers=4))
+        assert results[0] == 1
+        assert sum(results) == len(test_dict)
+        assert max(results) <= 6
+
+    def test_broken_pool_replaced(self):
+        from concurrent.futures.process import BrokenProcessPool
+        with pytest.raises(BrokenProcessPool):
+            list(map_batches(crash, self.numbers, 50, "process", workers=3))
+        results = list(map_batches(sum, self.numbers, 50, "process", workers=3))
+        assert results == [sum(self.numbers[:50]), sum(self.numbers[50:])]
+
+    def test_auto_batch_size(self):
+        assert auto_batch_size(0.001, 0.001, 1000, 4) == 20
+        assert auto_batch_size(1, 0.001, 1000, 4) == 1
+        assert auto_batch_size(0.000001, 1, 1000, 4) == 250
+
 class Test_timer:
     def test_timer(self, caplog):
         @timer
@@ -98,3 +148,516 @@ class Test_Converters:
         assert get_path_size(dirp, recursive=True) > get_path_size(dirp)
         assert get_path_size(dirp, recursive=True) > get_path_size(dirp)
 
+
+class Test_PageTimings:
+    class FakeBrowser:
+        def execute_script(self, script):
+            return {"navigation": {"name": "https://example.com", "requestStart": 10,
+                                   "responseStart": 60, "responseEnd": 70,
+                                   "domInteractive": 100, "loadEventEnd": 150},
+                    "resources": [{"transferSize": 1000}, {"transferSize": 500}]}
+
+    def test_summary(self, tmp_path):
+        timings = PageTimings()
+        for _ in range(3):
+            record = timings.capture(self.FakeBrowser(), "Example", "login", 200)
+        assert record["server"] == 50
+        assert record["dom_parse"] == 30
+        assert record["resource_bytes"] == 1500
+        summary = timings.summary()
+        assert summary[("Example", "login")]["count"] == 3
+        assert summary[("Example", "login")]["load"]["p90"] == 150
+        timings.to_csv(tmp_path / "timings.csv")
+        timings.to_json(tmp_path / "timings.json")
+        assert "dom_parse" in (tmp_path / "timings.csv").read_text()
+
+    def test_percentile(self):
+        assert percentile([1, 2, 3, 4, 5], 50) == 3
+        assert percentile([1, 2], 50) == 1.5
+        assert percentile([], 90) == 0
+
+class Test_StandInSite:
+    def test_pages(self):
+        from urllib.request import urlopen
+        with StandInSite(latency=0.01, page_weight=5000) as site:
+            html = urlopen(site.login_url("github")).read().decode()
+            assert 'id="login_field"' in html and 'name="commit"' in html
+            assert len(html) > 5000
+            html = urlopen(site.login_url("twitter")).read().decode()
+            assert "<span>Log in</span>" in html
+            html = urlopen(site.url + "/page/3").read().decode()
+            assert 'href="/page/39"' in html
+            html = urlopen(site.url + "/github/session", data=b"login=x").read().decode()
+            assert 'id="dashboard"' in html
+
+def echo_job(browser, job):
+    if job == "fail":
+        raise ValueError(job)
+    return (browser, job * 2)
+
+def shout_job(browser, job):
+    return job.upper()
+
+class Test_Workers:
+    def test_requeue_dead_worker(self):
+        broker = JobBroker()
+        broker.configure(timeout=0.1, max_attempts=2)
+        job_id = broker.put_job("job")
+        assert broker.get_job("worker1") == (job_id, "job")
+        assert broker.get_job("worker2") is None
+        time.sleep(0.2)
+        broker.heartbeat("worker2")
+        assert broker.get_job("worker2") == (job_id, "job")
+        time.sleep(0.2)
+        assert broker.pop_results()[job_id][2] == "Worker worker2 died 2 times"
+
+    def test_coordinator(self):
+        coordinator = Coordinator().start()
+        try:
+            coordinator.start_workers(2, func=echo_job, browsers=2, launch=None, poll=0.05)
+            coordinator.start_workers(2, func=echo_job, browsers=2, launch=None, poll=0.05)
+            assert len(coordinator.processes) == 2
+            results = {job: (result, error) for job, result, error in coordinator.run(["a", "b", "c", "fail"])}
+        finally:
+            coordinator.shutdown()
+        assert results["a"] == ((None, "aa"), None)
+        assert results["c"][0] == (None, "cc")
+        assert "ValueError" in results["fail"][1]
+
+    def test_workers_replaced_for_new_func(self):
+        coordinator = Coordinator().start()
+        try:
+            coordinator.start_workers(1, func=echo_job, launch=None, poll=0.05)
+            assert [r for _, r, _ in coordinator.run(["a"])] == [(None, "aa")]
+            first = coordinator.processes[0]
+            coordinator.start_workers(1, func=shout_job, launch=None, poll=0.05)
+            assert not first.is_alive()
+            assert [r for _, r, _ in coordinator.run(["b", "c"])] in (["B", "C"], ["C", "B"])
+        finally:
+            coordinator.shutdown()
+
+    def test_authkey(self):
+        assert len(Coordinator().authkey) == 32
+        with pytest.raises(ValueError):
+            Coordinator(address=("0.0.0.0", 0))
+        assert Coordinator(address=("0.0.0.0", 0), authkey=b"secret").authkey == b"secret"
+
+    def test_idle_timeout(self):
+        coordinator = Coordinator().start()
+        try:
+            with pytest.raises(TimeoutError):
+                list(coordinator.run(["a"], poll=0.01, idle_timeout=0.1))
+        finally:
+            coordinator.shutdown()
+
+class Test_extract:
+    class FakeBrowser:
+        def execute_script(self, script, *args):
+            self.args = args
+            return {"links": [{"text": "Home", "href": "https://example.com/"}]}
+
+    def test_extract(self):
+        browser = self.FakeBrowser()
+        result = extract(browser, {"links": {"selector": "a", "attributes": ["href"]}, "spans": "span"})
+        assert result["links"][0]["href"] == "https://example.com/"
+        assert browser.args[0]["spans"] == {"selector": "span"}
+
+    def test_find_by_text(self):
+        class NoMatch:
+            def execute_script(self, script, *args):
+                return None
+        with pytest.raises(NoSuchElementException):
+            find_by_text(NoMatch(), "span", "Log in")
+
+class Test_find_duplicates:
+    def test_find_duplicates(self, tmp_path):
+        (tmp_path / "nested").mkdir()
+        big = b"a" * 10000
+        (tmp_path / "big1.bin").write_bytes(big)
+        (tmp_path / "nested" / "big2.bin").write_bytes(big)
+        # Same size, same ends, different middle:
+        (tmp_path / "big3.bin").write_bytes(b"a" * 5000 + b"b" + b"a" * 4999)
+        (tmp_path / "small1.txt").write_text("hello")
+        (tmp_path / "small2.txt").write_text("hello")
+        (tmp_path / "other.txt").write_text("world!")
+        (tmp_path / "empty1.txt").touch()
+        (tmp_path / "empty2.txt").touch()
+        os.link(tmp_path / "big1.bin", tmp_path / "hardlink.bin")
+        results = find_duplicates(tmp_path, chunk_size=1024, unit="KB")
+        groups = {frozenset(p.name for p in group) for group in results.groups}
+        assert {"small1.txt", "small2.txt"} in groups
+        assert {"big1.bin", "big2.bin"} in groups or {"hardlink.bin", "big2.bin"} in groups
+        assert len(groups) == 2
+        assert results.reclaimable_formatted == "10 KB"
+        assert results.reclaimable == 10005
+        assert find_duplicates(tmp_path, recursive=False).reclaimable == 5
+
+    def test_no_inode_numbers(self, tmp_path, monkeypatch):
+        (tmp_path / "a.txt").write_text("same")
+        (tmp_path / "b.txt").write_text("same")
+        import cleverutils.cleverutils as module
+        class WindowsEntry:
+            """ DirEntry.stat() on Windows has st_ino and st_dev of 0 """
+            def __init__(self, entry):
+                self.path = entry.path
+            def stat(self, follow_symlinks=True):
+                real = os.stat(self.path)
+                return os.stat_result((real.st_mode, 0, 0) + tuple(real)[3:])
+        real_scan = module.scan_files
+        monkeypatch.setattr(module, "scan_files", lambda *args: [WindowsEntry(e) for e in real_scan(*args)])
+        results = find_duplicates(tmp_path)
+        assert [sorted(p.name for p in group) for group in results.groups] == [["a.txt", "b.txt"]]
+
+    def test_vanished_file(self, tmp_path, monkeypatch):
+        (tmp_path / "a.txt").write_text("same")
+        (tmp_path / "b.txt").write_text("same")
+        (tmp_path / "gone.txt").write_text("same")
+        import cleverutils.cleverutils as module
+        real_scan = module.scan_files
+        def scan_then_delete(path, recursive=True):
+            entries = list(real_scan(path, recursive))
+            (tmp_path / "gone.txt").unlink()
+            return entries
+        monkeypatch.setattr(module, "scan_files", scan_then_delete)
+        results = find_duplicates(tmp_path)
+        assert [sorted(p.name for p in group) for group in results.groups] == [["a.txt", "b.txt"]]
+
+class Test_disk_cache:
+    def test_memoise(self, tmp_path):
+        calls = []
+        @disk_cache(cache_dir=tmp_path)
+        def square(x, power=2):
+            calls.append(x)
+            return x ** power
+        assert square(3) == 9
+        assert square(3) == 9
+        assert square(3, power=3) == 27
+        assert calls == [3, 3]
+
+    def test_ttl(self, tmp_path):
+        calls = []
+        @disk_cache(ttl=0.1, cache_dir=tmp_path)
+        def example():
+            calls.append(1)
+            return "data"
+        example()
+        example()
+        time.sleep(0.2)
+        example()
+        assert len(calls) == 2
+
+    def test_lru(self, tmp_path):
+        @disk_cache(max_bytes=200, cache_dir=tmp_path)
+        def padded(x):
+            return str(x) * 50
+        for x in range(10):
+            padded(x)
+        files = list(tmp_path.glob("*.json"))
+        assert 0 < len(files) < 10
+        assert sum(f.stat().st_size for f in files) <= 200
+
+class Test_ChangeStore:
+    def test_fetch(self, tmp_path):
+        session = CleverDict()
+        session.setattr_direct("change_store", ChangeStore(tmp_path / "store.json"))
+        with StandInSite() as site:
+            url = site.url + "/page/1"
+            assert "Page 1" in Scrape.fetch(session, url)
+            assert Scrape.fetch(session, url) is None
+        assert session.change_store.counts == {"changed": 1, "skipped": 1}
+        session.change_store.save()
+        store = ChangeStore(tmp_path / "store.json")
+        assert store.headers(url)["If-None-Match"]
+        assert store.update(url, "new content") is True
+        assert store.update(url, "new content") is False
+        assert store.report() == "1 pages changed, 1 skipped"
+
+class Test_Autoscaler:
+    def test_proc(self):
+        rss, cpu = process_usage(process_tree(os.getpid()))
+        assert rss > 0 and cpu > 0
+        assert read_meminfo()["MemTotal"] > 0
+        assert initial_max_browsers() >= 1
+
+    def test_decide(self):
+        GiB = 2**30
+        scaler = Autoscaler(target_memory=0.5, target_cpu=1, limit=4)
+        # 16 GiB host, 4 browsers at 1 GiB each, 4 GiB used elsewhere
+        limit, reason = scaler.decide(4, GiB, 0.25, 16 * GiB, 8 * GiB, 8)
+        assert limit == 4 and reason == "at target"
+        # Other usage grows to 6 GiB: shrink straight to 2
+        limit, reason = scaler.decide(4, GiB, 0.25, 16 * GiB, 6 * GiB, 8)
+        assert limit == 2 and reason.startswith("memory")
+        # CPU bound: 2 cores per browser on 8 cores -> 4, grow by one at a time
+        scaler.limit = 1
+        limit, reason = scaler.decide(1, GiB // 4, 2, 16 * GiB, 14 * GiB, 8)
+        assert limit == 2 and reason == "CPU headroom for 4 browsers"
+
+    def test_starting_limit(self, monkeypatch):
+        import cleverutils.cleverscale as module
+        monkeypatch.setattr(module, "initial_max_browsers", lambda **kwargs: 51)
+        assert Autoscaler().limit == 5
+        monkeypatch.setattr(module, "initial_max_browsers", lambda **kwargs: 2)
+        assert Autoscaler().limit == 2
+
+    def test_unmeasured_cpu(self):
+        GiB = 2**30
+        scaler = Autoscaler(target_memory=0.5, limit=4)
+        # First measurement has no CPU delta: memory alone allows 6 browsers
+        limit, reason = scaler.decide(4, GiB, None, 16 * GiB, 10 * GiB, 1)
+        assert limit == 5 and reason == "memory headroom for 6 browsers"
+
+    def test_no_browsers(self):
+        scaler = Autoscaler(limit=2)
+        assert scaler.update([]) == 2
+        assert scaler.metrics["reason"] == "no browsers measured"
+        assert scaler.history == []
+
+    def test_update(self):
+        class FakeBrowser:
+            class service:
+                class process:
+                    pid = os.getpid()
+        scaler = Autoscaler(max_browsers=3)
+        assert 1 <= scaler.update([FakeBrowser()]) <= 3
+        assert scaler.metrics["browsers"] == 1
+
+class Test_TabPool:
+    class FakeBrowser:
+        """ Each tab finishes loading after being polled twice """
+        def __init__(self):
+            self.window_handles = ["main"]
+            self.current_window_handle = "main"
+            self.tabs = {"main": None}
+            self.polls = {}
+            self.switch_to = self
+            self.closed = []
+
+        def window(self, handle):
+            self.current_window_handle = handle
+
+        def close(self):
+            self.closed.append(self.current_window_handle)
+
+        def execute_script(self, script, *args):
+            handle = self.current_window_handle
+            if "window.open" in script:
+                new = f"tab{len(self.window_handles)}"
+                self.window_handles.append(new)
+                self.tabs[new] = None
+            elif script == TabPool.NAVIGATE_JS:
+                self.tabs[handle] = args[0]
+                self.polls[handle] = 0
+            elif script == TabPool.READY_JS:
+                self.polls[handle] += 1
+                return self.polls[handle] >= 2
+
+    def test_map(self):
+        browser = self.FakeBrowser()
+        urls = [f"https://example.com/{x}" for x in range(7)]
+        with TabPool(browser, tabs=3) as pool:
+            assert pool.handles == ["main", "tab1", "tab2"]
+            results = dict(pool.map(urls, lambda b, url: b.current_window_handle, poll=0))
+        assert sorted(results) == urls
+        assert set(results.values()) == {"main", "tab1", "tab2"}
+        assert browser.closed == ["tab1", "tab2"]
+        assert browser.current_window_handle == "main"
+
+    def test_scrape_pages(self):
+        session = BasicSession(browser=self.FakeBrowser())
+        session.setattr_direct("page_timings", PageTimings())
+        urls = [f"https://example.com/{x}" for x in range(3)]
+        results = Scrape.pages(session, urls, tabs=2, step="listing", poll=0)
+        assert sorted(results) == urls
+        records = session.page_timings.records
+        assert [r["step"] for r in records] == ["listing"] * 3
+        assert {r["site"] for r in records} == {"example.com"}
+        assert all(r["get"] > 0 for r in records)
+
+class Test_profiles:
+    def test_capture_and_clone(self, tmp_path, monkeypatch):
+        import cleverutils.cleverprofiles
+        monkeypatch.setattr(cleverutils.cleverprofiles, "PROFILES_PATH", tmp_path / "profiles")
+        warm = tmp_path / "warm"
+        (warm / "Default" / "Cache" / "Cache_Data").mkdir(parents=True)
+        (warm / "Default" / "Cache" / "Cache_Data" / "f_000001").write_text("cached")
+        (warm / "Default" / "Cookies").write_text("logged in")
+        (warm / "SingletonLock").write_text("locked")
+        capture_profile(warm, "example")
+        clone = clone_profile("example")
+        assert (clone / "Default" / "Cookies").read_text() == "logged in"
+        (clone / "Default" / "Cookies").write_text("changed")
+        assert (template_path("example") / "Default" / "Cookies").read_text() == "logged in"
+        assert (clone / "Default" / "Cache" / "Cache_Data" / "f_000001").read_text() == "cached"
+        assert not (clone / "SingletonLock").exists()
+        with pytest.raises(FileNotFoundError):
+            clone_profile("missing")
+        # Clones in use by a live process are kept, however old:
+        assert clean_profiles(max_age=-1) == [template_path("example")]
+        assert clone.exists()
+
+    def test_old_source_and_release(self, tmp_path, monkeypatch):
+        import cleverutils.cleverprofiles
+        monkeypatch.setattr(cleverutils.cleverprofiles, "PROFILES_PATH", tmp_path / "profiles")
+        old = tmp_path / "old"
+        (old / "Default").mkdir(parents=True)
+        (old / "Default" / "Preferences").write_text("{}")
+        last_month = time.time() - 30 * 86400
+        os.utime(old, (last_month, last_month))
+        capture_profile(old, "old")
+        clone = clone_profile("old")  # Template mustn't be cleaned as stale
+        class FakeBrowser:
+            cleverutils_profile = clone
+            def quit(self):
+                self.quitted = True
+        browser = FakeBrowser()
+        quit_browser(browser)
+        assert browser.quitted and not clone.exists()
+        dead = tmp_path / "profiles" / "clones" / "old.999999999.abcdef12"
+        dead.mkdir()
+        assert clean_profiles() == [dead]
+
+class Test_CleverSession_startup:
+    class FakeChrome:
+        launched = []
+        delay = 0.1
+        def __init__(self, options=None):
+            time.sleep(self.delay)
+            Test_CleverSession_startup.FakeChrome.launched.append(self)
+        def implicitly_wait(self, seconds):
+            self.wait = seconds
+
+    @pytest.fixture
+    def patched(self, monkeypatch):
+        import cleverutils.cleversession as module
+        class Credential:
+            username = "octocat"
+        monkeypatch.setattr(module, "start_gui", lambda **kwargs: None)
+        monkeypatch.setattr(module.webdriver, "Chrome", self.FakeChrome)
+        monkeypatch.setattr(module.keyring, "get_credential", lambda *args: Credential())
+        self.FakeChrome.launched.clear()
+        return module
+
+    def test_background_startup(self, patched, monkeypatch):
+        monkeypatch.setattr(self.FakeChrome, "delay", 1)
+        start = time.perf_counter()
+        cs = CleverSession(url="https://github.com/login", echo=False, wait=7)
+        assert time.perf_counter() - start < 0.5  # Didn't wait for Chrome
+        assert cs.startup._shutdown
+        browser = cs.wait_for_startup()
+        assert cs.username == "octocat"
+        assert browser is self.FakeChrome.launched[0]
+        assert cs.browser is browser and browser.wait == 7
+        assert len(self.FakeChrome.launched) == 1
+        assert cs.browser_future is None and cs.username_future is None
+
+    def test_pinned_max_browsers(self, patched):
+        cs = CleverSession(url="https://github.com/login", max_browsers=2)
+        cs.wait_for_startup()
+        assert cs.autoscale() == 2 and cs.max_browsers == 2
+        cs = CleverSession(url="https://github.com/login")
+        cs.wait_for_startup()
+        assert cs.autoscale() == cs.autoscaler.limit
+        cs.max_browsers = cs.autoscaler.limit + 3
+        assert cs.autoscale() == cs.autoscaler.limit + 3
+
+    def test_launch_failure(self, patched, monkeypatch):
+        def fail(options=None):
+            raise WebDriverException("chromedriver not found")
+        monkeypatch.setattr(patched.webdriver, "Chrome", fail)
+        cs = CleverSession(url="https://github.com/login", echo=False)
+        with pytest.raises(WebDriverException):
+            cs.browser
+        cs.username_future.result()  # Finish while keyring is still patched
+
+class Test_run_in_browsers:
+    def test_errors(self):
+        def job(browser, number):
+            if browser == "broken" and number % 2:
+                raise ValueError(number)
+        seconds, completed, errors = run_in_browsers(["ok", "broken"], list(range(8)), job)
+        # "broken" gets jobs 1, 3, 5, 7 and fails all of them
+        assert completed == 4
+        assert sorted(errors) == ["ValueError(1)", "ValueError(3)", "ValueError(5)", "ValueError(7)"]
+
+class Point:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+class Opaque:
+    def __init__(self):
+        self.secret = 1
+
+class Test_disk_cache_objects:
+    def test_custom_objects(self, tmp_path):
+        assert "." in Point.__module__  # Class lives in a dotted module
+        @disk_cache(cache_dir=tmp_path)
+        def make_point(x):
+            return Point(x, x * 2)
+        for _ in range(3):
+            point = make_point(2)
+            assert isinstance(point, Point) and point.y == 4
+
+    def test_unreadable_entry(self, tmp_path):
+        calls = []
+        @disk_cache(cache_dir=tmp_path)
+        def make_opaque():
+            calls.append(1)
+            return Opaque()
+        assert isinstance(make_opaque(), Opaque)
+        assert isinstance(make_opaque(), Opaque)
+        assert len(calls) == 2  # Opaque(**attributes) fails, so never cached
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_corrupt_entry(self, tmp_path):
+        def answer():
+            return 42
+        cached = disk_cache(answer, cache_dir=tmp_path)
+        file_path = tmp_path / f"{cache_key(answer, (), {})}.json"
+        file_path.write_text("{not json")
+        assert cached() == 42
+        assert json.loads(file_path.read_text())["value"] == 42
+
+    def test_not_serialisable(self, tmp_path):
+        @disk_cache(cache_dir=tmp_path)
+        def make_set():
+            return {1, 2, 3}
+        assert make_set() == {1, 2, 3}
+        assert make_set() == {1, 2, 3}
+
+    def test_unstable_arguments(self, tmp_path):
+        calls = []
+        @disk_cache(cache_dir=tmp_path)
+        def identity(obj):
+            calls.append(1)
+            return 1
+        identity(object())
+        identity(object())
+        assert len(calls) == 2
+        assert not list(tmp_path.glob("*.json"))
+        assert cache_key(identity, ({3, 1, 2},), {}) == cache_key(identity, ({1, 2, 3},), {})
+
+    def test_callable_arguments(self, tmp_path):
+        @disk_cache(cache_dir=tmp_path)
+        def apply(func, x):
+            return func(x)
+        def square(x):
+            return x ** 2
+        def cube(x):
+            return x ** 3
+        assert apply(square, 3) == 9
+        assert apply(cube, 3) == 27
+        assert apply(lambda x: -x, 3) == -3
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_values_must_round_trip(self, tmp_path):
+        calls = []
+        @disk_cache(cache_dir=tmp_path)
+        def example(kind):
+            calls.append(kind)
+            return {"dict": {1: "a"}, "tuple": (1, 2), "point": Point(1, 2)}[kind]
+        for _ in range(2):
+            assert example("dict") == {1: "a"}
+            assert example("tuple") == (1, 2)
+            assert example("point").y == 2
+        assert calls == ["dict", "tuple", "point", "dict", "tuple"]